@@ -1,88 +1,474 @@
 import streamlit as st
+import pandas as pd
 import sqlite3
 import uuid
 import datetime
+import hashlib
+import hmac
+import math
+import os
+import threading
+from contextlib import contextmanager
+
+DB_PATH = "contracts.db"
+
+# Bump whenever a table layout changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 3
+
+# scrypt cost parameters for password hashing
+SCRYPT_PARAMS = {"n": 2**14, "r": 8, "p": 1, "dklen": 32}
+
+# Hashed against on unknown usernames so a miss costs the same scrypt work as a hit
+DUMMY_SALT = os.urandom(16)
+DUMMY_HASH = bytes(SCRYPT_PARAMS["dklen"])
+
+# Applied to every pooled connection right after it is opened
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # readers don't block on the writer
+    "PRAGMA synchronous=NORMAL",    # no fsync per commit in WAL mode
+    "PRAGMA busy_timeout=5000",     # wait for locks instead of failing with "database is locked"
+    "PRAGMA cache_size=-32000",     # ~32 MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Idle reader connections kept open per process
+READER_POOL_SIZE = 2 * (os.cpu_count() or 1)
+
+# Rows per page in the contract, service report and invoice tables
+PAGE_SIZE = 50
+MAX_ID_MATCHES = 10  # Contracts listed when a short ID is ambiguous
+
+# Hot-path SQL, kept as module constants so every call passes the identical
+# string and hits the connection's prepared-statement cache
+STMTS = {
+    "get_user": "SELECT user_id, username, role, password_hash, salt FROM users WHERE username=?",
+    "insert_contract": """
+        INSERT INTO contracts (contract_id, vendor_name, description, start_date, end_date, budget, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    # Contracts whose id starts with a given prefix: a range scan on the primary key
+    "find_contracts_by_prefix": """
+        SELECT contract_id, vendor_name FROM contracts WHERE contract_id BETWEEN ? AND ?
+        ORDER BY contract_id LIMIT ?
+    """,
+    # Status changes only apply from the expected current status, so a repeated
+    # click is a no-op (rowcount 0) instead of a second write
+    "update_contract_status": "UPDATE contracts SET status=? WHERE contract_id=? AND status=?",
+    "select_approvers": "SELECT user_id FROM users WHERE role='approver'",
+    "insert_approval": """
+        INSERT INTO approvals (approval_id, contract_id, approver_id, approval_status, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+    "update_approval_status": "UPDATE approvals SET approval_status=? WHERE approval_id=? AND approval_status='Pending'",
+    # Activate a contract once none of its approvals is outstanding
+    "activate_if_fully_approved": """
+        UPDATE contracts SET status='Active'
+        WHERE contract_id=?
+          AND NOT EXISTS (SELECT 1 FROM approvals WHERE contract_id=? AND approval_status<>'Approved')
+    """,
+    "insert_service_report": """
+        INSERT INTO service_reports (report_id, contract_id, service_date, work_performed, parts_cost, labor_hours)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "mark_invoice_paid": "UPDATE invoices SET payment_status='Paid' WHERE invoice_id=? AND payment_status<>'Paid'",
+    "insert_invoice": """
+        INSERT INTO invoices (invoice_id, contract_id, amount, invoice_date, payment_status)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+}
 
 # ---------------------------
 # 1. DATABASE SETUP & HELPERS
 # ---------------------------
+class SQLiteConnectionPool:
+    """
+    Keep SQLite connections open across Streamlit reruns.
+    Writes go through a single writer connection guarded by a lock; reads use
+    a small pool of reader connections so they never queue behind the writer.
+    A reader checked out by a thread is tracked by thread id, so nested
+    get_conn() calls share it; on release it goes back to the idle list
+    instead of being closed.
+    """
+    def __init__(self, path, max_readers=READER_POOL_SIZE):
+        self.path = path
+        self.max_readers = max_readers
+        self._lock = threading.Lock()
+        self._idle = []
+        self._in_use = {}  # thread id -> [connection, nesting depth]
+        self._writer = None
+        self._writer_lock = threading.RLock()
+
+    def _connect(self):
+        # Autocommit mode: every statement commits unless a transaction is opened explicitly
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                               cached_statements=256)
+        try:
+            conn.row_factory = sqlite3.Row
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+        except BaseException:
+            # Never hand out or pool a half-configured connection
+            conn.close()
+            raise
+        return conn
+
+    def acquire(self, write=False):
+        if write:
+            self._writer_lock.acquire()
+            if self._writer is None:
+                try:
+                    self._writer = self._connect()
+                except BaseException:
+                    # get_conn() only releases what it acquired; don't leave the lock held
+                    self._writer_lock.release()
+                    raise
+            return self._writer
+
+        tid = threading.get_ident()
+        with self._lock:
+            entry = self._in_use.get(tid)
+            if entry is None:
+                conn = self._idle.pop() if self._idle else self._connect()
+                entry = self._in_use[tid] = [conn, 0]
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, write=False):
+        if write:
+            self._writer_lock.release()
+            return
+
+        tid = threading.get_ident()
+        with self._lock:
+            entry = self._in_use[tid]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._in_use[tid]
+                if len(self._idle) < self.max_readers:
+                    self._idle.append(entry[0])
+                else:
+                    entry[0].close()
+
+@st.cache_resource
+def get_pool():
+    """One pool per Streamlit process, shared by all sessions and reruns."""
+    return SQLiteConnectionPool(DB_PATH)
+
+@contextmanager
+def get_conn(write=False):
+    """
+    Check out a pooled connection for the duration of a with-block.
+    Pass write=True for anything that modifies the database.
+    """
+    pool = get_pool()
+    conn = pool.acquire(write)
+    try:
+        yield conn
+    finally:
+        pool.release(write)
+
+@contextmanager
+def write_transaction():
+    """
+    Check out the writer connection inside one BEGIN IMMEDIATE transaction.
+    Taking the write lock up front means SQLite never has to upgrade a read
+    lock mid-transaction; commits on normal exit, rolls back on error.
+    """
+    with get_conn(write=True) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        with conn:
+            yield conn
+
+@st.cache_resource
+def _data_versions():
+    """Per-table change counters shared by all sessions in the process, plus the lock guarding them."""
+    return threading.Lock(), {}
+
+def data_version(table):
+    """Current version of a table; pass it to cached loaders as part of the cache key."""
+    lock, versions = _data_versions()
+    return versions.get(table, 0)
+
+def bump_version(*tables):
+    """Invalidate cached listings of the given tables after a write."""
+    lock, versions = _data_versions()
+    # Script threads of different sessions bump concurrently; an unguarded
+    # read-modify-write could hand two writes the same version
+    with lock:
+        for table in tables:
+            versions[table] = versions.get(table, 0) + 1
+
+@st.cache_data(ttl=30)
+def count_rows(table, version):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT COUNT(*) FROM {table}")
+        return c.fetchone()[0]
+
+def page_number(total, key):
+    """Page selector for a listing of `total` rows; returns the 1-based page number."""
+    pages = max(1, math.ceil(total / PAGE_SIZE))
+    return st.number_input("Page", min_value=1, max_value=pages, step=1, key=key)
+
+@st.cache_resource
+def setup_db():
+    """Create the schema and demo users once per process instead of on every rerun."""
+    init_db()
+    seed_users()
+
 def init_db():
-    """Create tables if not already existing."""
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-
-    # Users table
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        user_id TEXT PRIMARY KEY,
-        username TEXT UNIQUE,
-        password TEXT,
-        role TEXT
-    )
-    """)
-
-    # Contracts table
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS contracts (
-        contract_id TEXT PRIMARY KEY,
-        vendor_name TEXT,
-        description TEXT,
-        start_date TEXT,
-        end_date TEXT,
-        budget REAL,
-        status TEXT  -- e.g. Draft, Pending Approval, Active, Rejected
-    )
-    """)
-
-    # Approvals table - one row per contract per approver
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS approvals (
-        approval_id TEXT PRIMARY KEY,
-        contract_id TEXT,
-        approver_id TEXT,
-        approval_status TEXT,  -- Pending, Approved, Rejected
-        timestamp TEXT,
-        FOREIGN KEY(contract_id) REFERENCES contracts(contract_id),
-        FOREIGN KEY(approver_id) REFERENCES users(user_id)
-    )
-    """)
-
-    # Service Reports
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS service_reports (
-        report_id TEXT PRIMARY KEY,
-        contract_id TEXT,
-        service_date TEXT,
-        work_performed TEXT,
-        parts_cost REAL,
-        labor_hours REAL,
-        FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
-    )
-    """)
-
-    # Invoices
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS invoices (
-        invoice_id TEXT PRIMARY KEY,
-        contract_id TEXT,
-        amount REAL,
-        invoice_date TEXT,
-        payment_status TEXT,  -- Pending, Paid, Overdue, etc.
-        FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Create tables if not already existing, upgrading a database from an older version first."""
+    with get_conn(write=True) as conn:
+        c = conn.cursor()
+
+        # CREATE TABLE IF NOT EXISTS would silently keep tables from an older layout
+        c.execute("PRAGMA user_version")
+        version = c.fetchone()[0]
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='users'")
+        if c.fetchone():
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f"{DB_PATH} was created by a newer version of this app "
+                                   f"(schema {version}; this version supports up to {SCHEMA_VERSION}).")
+            if version < SCHEMA_VERSION:
+                upgrade_db(conn, version)
+
+        # Users table
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BLOB PRIMARY KEY,
+            username TEXT UNIQUE,
+            password_hash BLOB,
+            salt BLOB,
+            role TEXT
+        )
+        """)
+
+        # Contracts table
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS contracts (
+            contract_id BLOB PRIMARY KEY,
+            vendor_name TEXT,
+            description TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            budget INTEGER,  -- cents
+            status TEXT  -- e.g. Draft, Pending Approval, Active, Rejected
+        )
+        """)
+
+        # Approvals table - one row per contract per approver
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS approvals (
+            approval_id BLOB PRIMARY KEY,
+            contract_id BLOB,
+            approver_id BLOB,
+            approval_status TEXT,  -- Pending, Approved, Rejected
+            timestamp TEXT,
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id),
+            FOREIGN KEY(approver_id) REFERENCES users(user_id)
+        )
+        """)
+
+        # Service Reports
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS service_reports (
+            report_id BLOB PRIMARY KEY,
+            contract_id BLOB,
+            service_date TEXT,
+            work_performed TEXT,
+            parts_cost INTEGER,  -- cents
+            labor_hours REAL,
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
+        )
+        """)
+
+        # Invoices
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS invoices (
+            invoice_id BLOB PRIMARY KEY,
+            contract_id BLOB,
+            amount INTEGER,  -- cents
+            invoice_date TEXT,
+            payment_status TEXT,  -- Pending, Paid, Overdue, etc.
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
+        )
+        """)
+
+        # Indexes on the columns pages filter and join on
+        # Only pending approvals are ever listed per approver, so index just those rows;
+        # approval_id is included so the review query never touches the table rows
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_approvals_pending ON approvals(approver_id, contract_id, approval_id)
+            WHERE approval_status='Pending'
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_approvals_contract ON approvals(contract_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_contracts_status ON contracts(status)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_reports_contract ON service_reports(contract_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_invoices_contract ON invoices(contract_id)")
+
+        c.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+def upgrade_db(conn, version):
+    """
+    Migrate a database from schema `version` to SCHEMA_VERSION in one transaction.
+    Foreign keys are switched off around the transaction so tables can be
+    rebuilt (SQLite ignores that pragma inside a transaction), and the file
+    is vacuumed afterwards to reclaim the pages of the replaced tables.
+    """
+    if len(MIGRATIONS) < SCHEMA_VERSION:
+        raise RuntimeError(f"No upgrade path from schema {version} to {SCHEMA_VERSION}.")
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        with write_transaction() as txn:
+            c = txn.cursor()
+            for step in MIGRATIONS[version:SCHEMA_VERSION]:
+                step(c)
+            # Committed together with the data, so an interrupted upgrade never re-runs a step
+            c.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+    # VACUUM can't run inside a transaction; the upgrade is already committed
+    conn.execute("VACUUM")
+
+def _migrate_v0_hash_passwords(c):
+    """Schema 0 -> 1: replace plaintext passwords with salted scrypt hashes."""
+    c.execute("ALTER TABLE users ADD COLUMN password_hash BLOB")
+    c.execute("ALTER TABLE users ADD COLUMN salt BLOB")
+    c.execute("SELECT user_id, password FROM users")
+    rows = []
+    for row in c.fetchall():
+        salt = os.urandom(16)
+        rows.append((hash_password(row["password"], salt), salt, row["user_id"]))
+    c.executemany("UPDATE users SET password_hash=?, salt=? WHERE user_id=?", rows)
+    c.execute("ALTER TABLE users DROP COLUMN password")
+
+def _rebuild_table(c, table, create_sql, columns):
+    """
+    Replace `table` with one created by `create_sql` (a template with a
+    {table} placeholder), copying rows through the `columns` mapping of
+    new column -> SQL expression over the old table.
+    """
+    c.execute(create_sql.format(table=f"{table}_new"))
+    c.execute(f"INSERT INTO {table}_new ({', '.join(columns)}) "
+              f"SELECT {', '.join(columns.values())} FROM {table}")
+    c.execute(f"DROP TABLE {table}")
+    c.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+def _id_to_blob(text_id):
+    """Convert a TEXT uuid to its 16 bytes; free-text ids the old forms accepted get a stable stand-in."""
+    if text_id is None:
+        return None
+    try:
+        return uuid.UUID(str(text_id)).bytes
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_OID, str(text_id)).bytes
+
+def _migrate_v1_blob_ids(c):
+    """Schema 1 -> 2: store every primary and foreign key as 16-byte BLOBs instead of TEXT uuids."""
+    c.connection.create_function("id_to_blob", 1, _id_to_blob, deterministic=True)
+    _rebuild_table(c, "users", """
+        CREATE TABLE {table} (
+            user_id BLOB PRIMARY KEY, username TEXT UNIQUE, password_hash BLOB, salt BLOB, role TEXT
+        )
+    """, {"user_id": "id_to_blob(user_id)", "username": "username",
+          "password_hash": "password_hash", "salt": "salt", "role": "role"})
+    _rebuild_table(c, "contracts", """
+        CREATE TABLE {table} (
+            contract_id BLOB PRIMARY KEY, vendor_name TEXT, description TEXT,
+            start_date TEXT, end_date TEXT, budget REAL, status TEXT
+        )
+    """, {"contract_id": "id_to_blob(contract_id)", "vendor_name": "vendor_name", "description": "description",
+          "start_date": "start_date", "end_date": "end_date", "budget": "budget", "status": "status"})
+    _rebuild_table(c, "approvals", """
+        CREATE TABLE {table} (
+            approval_id BLOB PRIMARY KEY, contract_id BLOB, approver_id BLOB, approval_status TEXT, timestamp TEXT,
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id),
+            FOREIGN KEY(approver_id) REFERENCES users(user_id)
+        )
+    """, {"approval_id": "id_to_blob(approval_id)", "contract_id": "id_to_blob(contract_id)",
+          "approver_id": "id_to_blob(approver_id)", "approval_status": "approval_status", "timestamp": "timestamp"})
+    _rebuild_table(c, "service_reports", """
+        CREATE TABLE {table} (
+            report_id BLOB PRIMARY KEY, contract_id BLOB, service_date TEXT, work_performed TEXT,
+            parts_cost REAL, labor_hours REAL,
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
+        )
+    """, {"report_id": "id_to_blob(report_id)", "contract_id": "id_to_blob(contract_id)",
+          "service_date": "service_date", "work_performed": "work_performed",
+          "parts_cost": "parts_cost", "labor_hours": "labor_hours"})
+    _rebuild_table(c, "invoices", """
+        CREATE TABLE {table} (
+            invoice_id BLOB PRIMARY KEY, contract_id BLOB, amount REAL, invoice_date TEXT, payment_status TEXT,
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
+        )
+    """, {"invoice_id": "id_to_blob(invoice_id)", "contract_id": "id_to_blob(contract_id)",
+          "amount": "amount", "invoice_date": "invoice_date", "payment_status": "payment_status"})
+
+def _migrate_v2_money_cents(c):
+    """
+    Schema 2 -> 3: store budget, parts_cost and amount as INTEGER cents instead
+    of REAL, and drop the approver index superseded by idx_approvals_pending.
+    """
+    c.execute("DROP INDEX IF EXISTS idx_approvals_approver_status")
+    _rebuild_table(c, "contracts", """
+        CREATE TABLE {table} (
+            contract_id BLOB PRIMARY KEY, vendor_name TEXT, description TEXT,
+            start_date TEXT, end_date TEXT, budget INTEGER, status TEXT
+        )
+    """, {"contract_id": "contract_id", "vendor_name": "vendor_name", "description": "description",
+          "start_date": "start_date", "end_date": "end_date",
+          "budget": "CAST(ROUND(budget * 100) AS INTEGER)", "status": "status"})
+    _rebuild_table(c, "service_reports", """
+        CREATE TABLE {table} (
+            report_id BLOB PRIMARY KEY, contract_id BLOB, service_date TEXT, work_performed TEXT,
+            parts_cost INTEGER, labor_hours REAL,
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
+        )
+    """, {"report_id": "report_id", "contract_id": "contract_id",
+          "service_date": "service_date", "work_performed": "work_performed",
+          "parts_cost": "CAST(ROUND(parts_cost * 100) AS INTEGER)", "labor_hours": "labor_hours"})
+    _rebuild_table(c, "invoices", """
+        CREATE TABLE {table} (
+            invoice_id BLOB PRIMARY KEY, contract_id BLOB, amount INTEGER, invoice_date TEXT, payment_status TEXT,
+            FOREIGN KEY(contract_id) REFERENCES contracts(contract_id)
+        )
+    """, {"invoice_id": "invoice_id", "contract_id": "contract_id",
+          "amount": "CAST(ROUND(amount * 100) AS INTEGER)",
+          "invoice_date": "invoice_date", "payment_status": "payment_status"})
+
+# MIGRATIONS[n] upgrades a database from schema n to n + 1
+MIGRATIONS = [
+    _migrate_v0_hash_passwords,
+    _migrate_v1_blob_ids,
+    _migrate_v2_money_cents,
+]
+
+def new_id():
+    """Random 16-byte primary key, stored as a BLOB."""
+    return uuid.uuid4().bytes
+
+def format_id(id_bytes):
+    """Short hex form of a BLOB id for display."""
+    return uuid.UUID(bytes=id_bytes).hex[:8]
+
+def to_cents(amount):
+    """Convert an entered currency amount to integer cents for storage."""
+    return int(round(amount * 100))
+
+def format_money(cents):
+    """Format stored integer cents for display."""
+    return f"${cents / 100:,.2f}"
+
+def hash_password(password, salt):
+    """Derive the stored password hash with scrypt."""
+    return hashlib.scrypt(password.encode(), salt=salt, **SCRYPT_PARAMS)
 
 def seed_users():
     """
     Create a few demo users with different roles, if they don't already exist.
-    In production, always store hashed passwords!
+    Passwords are stored as salted scrypt hashes.
     """
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-
     # Attempt to create some demo users
     demo_users = [
         ("manager_user", "manager_pass", "manager"),     # Contract Manager
@@ -91,51 +477,47 @@ def seed_users():
         ("approver_user3", "approver_pass3", "approver"), # Approver (Legal Officer)
         ("finance_user", "finance_pass", "finance")      # Finance role for invoicing
     ]
+    rows = []
     for username, password, role in demo_users:
-        # Check if user exists
-        c.execute("SELECT * FROM users WHERE username = ?", (username,))
-        if not c.fetchone():
-            user_id = str(uuid.uuid4())
-            c.execute("INSERT INTO users (user_id, username, password, role) VALUES (?, ?, ?, ?)",
-                      (user_id, username, password, role))
-    conn.commit()
-    conn.close()
+        salt = os.urandom(16)
+        rows.append((new_id(), username, hash_password(password, salt), salt, role))
+    with write_transaction() as conn:
+        # The UNIQUE constraint on username skips users that already exist
+        conn.executemany("""
+            INSERT OR IGNORE INTO users (user_id, username, password_hash, salt, role)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
 
 def get_user(username, password):
-    """Return user record if username/password match, else None."""
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-    user = c.fetchone()
-    conn.close()
-    return user  # (user_id, username, password, role)
-
-# Helper to get user role from user_id
-def get_user_role(user_id):
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    c.execute("SELECT role FROM users WHERE user_id=?", (user_id,))
-    row = c.fetchone()
-    conn.close()
-    return row[0] if row else None
+    """Return (user_id, username, role) if username/password match, else None."""
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(STMTS["get_user"], (username,))
+        row = c.fetchone()
+    if row is None:
+        # Don't let response time reveal which usernames exist
+        hmac.compare_digest(DUMMY_HASH, hash_password(password, DUMMY_SALT))
+        return None
+    if not hmac.compare_digest(row["password_hash"], hash_password(password, row["salt"])):
+        return None
+    return row["user_id"], row["username"], row["role"]
 
 # -----------
 # 2. MAIN APP
 # -----------
 def main():
     st.set_page_config(page_title="O&M Contract Management", layout="wide")
-    init_db()
-    seed_users()
+    setup_db()
 
     if "user_id" not in st.session_state:
         st.session_state.user_id = None
+        st.session_state.role = None
 
     if st.session_state.user_id is None:
         login_page()
     else:
-        # We have a logged-in user
-        role = get_user_role(st.session_state.user_id)
-        app_layout(role)
+        # We have a logged-in user; the role was stored at login
+        app_layout(st.session_state.role)
 
 def login_page():
     st.title("O&M Contract Management - Login")
@@ -145,8 +527,9 @@ def login_page():
     if st.button("Login"):
         user_record = get_user(username, password)
         if user_record:
-            # user_record = (user_id, username, password, role)
+            # user_record = (user_id, username, role)
             st.session_state.user_id = user_record[0]
+            st.session_state.role = user_record[2]
             st.success("Login successful!")
             st.rerun()
         else:
@@ -186,6 +569,7 @@ def app_layout(role):
         manage_invoices()
     elif choice == "Logout":
         st.session_state.user_id = None
+        st.session_state.role = None
         st.rerun()
 
 def home_page(role):
@@ -200,33 +584,78 @@ def home_page(role):
 # -------------------------
 # 3. CONTRACTS (Manager)
 # -------------------------
+# Cached loaders return plain dicts: st.cache_data pickles results and sqlite3.Row can't be pickled
+@st.cache_data(ttl=30)
+def load_contracts(version, page):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT contract_id, vendor_name, status, budget FROM contracts
+            ORDER BY rowid LIMIT ? OFFSET ?
+        """, (PAGE_SIZE, (page - 1) * PAGE_SIZE))
+        return [dict(row) for row in c.fetchall()]
+
+def find_contracts_by_id(text):
+    """
+    Contracts matching a typed ID, either a full uuid or the short id shown in
+    the tables, as (BLOB key, vendor) pairs; empty if the text isn't an ID.
+    """
+    try:
+        prefix = bytes.fromhex(text.strip().replace("-", ""))
+    except ValueError:
+        return []
+    if not 4 <= len(prefix) <= 16:
+        return []
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute(STMTS["find_contracts_by_prefix"],
+                  (prefix.ljust(16, b"\x00"), prefix.ljust(16, b"\xff"), MAX_ID_MATCHES + 1))
+        return [(row["contract_id"], row["vendor_name"]) for row in c.fetchall()]
+
+def resolve_contract_id(text):
+    """
+    BLOB key of the one contract matching a typed ID. Otherwise shows an error
+    and returns None; when a short id is shared, the error lists the full ids
+    so one can be pasted back in.
+    """
+    matches = find_contracts_by_id(text)
+    if len(matches) == 1:
+        return matches[0][0]
+    if not matches:
+        st.error(f"No contract matches ID {text!r}.")
+        return None
+    listed = "\n".join(f"- `{uuid.UUID(bytes=contract_id)}` ({vendor})"
+                       for contract_id, vendor in matches[:MAX_ID_MATCHES])
+    more = "\n- ..." if len(matches) > MAX_ID_MATCHES else ""
+    st.error(f"ID {text!r} matches several contracts; enter the full ID:\n{listed}{more}")
+    return None
+
 def manage_contracts():
     st.title("Manage Contracts (Manager Only)")
 
     # For demonstration, we’ll show existing contracts in a table
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-
-    # Display existing contracts
-    c.execute("SELECT contract_id, vendor_name, status, budget FROM contracts")
-    rows = c.fetchall()
-    conn.close()
+    version = data_version("contracts")
+    total = count_rows("contracts", version)
 
     st.subheader("Existing Contracts")
-    if rows:
-        for row in rows:
-            contract_id, vendor_name, status, budget = row
-            st.write(f"**Contract ID**: {contract_id}")
-            st.write(f"**Vendor**: {vendor_name}")
-            st.write(f"**Budget**: {budget}")
-            st.write(f"**Status**: {status}")
-            # If Draft, allow submission
-            if status == "Draft":
-                if st.button(f"Submit for Approval - {contract_id}", key=f"submit_{contract_id}"):
-                    submit_contract_for_approval(contract_id)
-                    st.success("Submitted for approval.")
+    if total:
+        page = page_number(total, "contracts_page")
+        rows = load_contracts(version, page)
+        st.dataframe(pd.DataFrame(
+            [(format_id(row["contract_id"]), row["vendor_name"], format_money(row["budget"]), row["status"])
+             for row in rows],
+            columns=["Contract ID", "Vendor", "Budget", "Status"],
+        ), hide_index=True)
+
+        # Drafts on this page can be submitted
+        drafts = {row["contract_id"]: f"{format_id(row['contract_id'])} - {row['vendor_name']}"
+                  for row in rows if row["status"] == "Draft"}
+        if drafts:
+            contract_id = st.selectbox("Draft contract", list(drafts), format_func=drafts.get)
+            if st.button("Submit for Approval"):
+                if submit_contract_for_approval(contract_id):
                     st.rerun()
-            st.write("---")
+                st.info("This contract has already been submitted.")
     else:
         st.info("No contracts found.")
 
@@ -245,147 +674,137 @@ def manage_contracts():
             st.rerun()
 
 def create_contract(vendor, desc, start_date, end_date, budget):
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    contract_id = str(uuid.uuid4())
-    c.execute("""
-        INSERT INTO contracts (contract_id, vendor_name, description, start_date, end_date, budget, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (contract_id, vendor, desc, str(start_date), str(end_date), budget, "Draft"))
-    conn.commit()
-    conn.close()
+    contract_id = new_id()
+    with get_conn(write=True) as conn:
+        c = conn.cursor()
+        c.execute(STMTS["insert_contract"], (contract_id, vendor, desc, str(start_date), str(end_date), to_cents(budget), "Draft"))
+    bump_version("contracts")
 
 def submit_contract_for_approval(contract_id):
-    # Update status to Pending Approval
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    c.execute("UPDATE contracts SET status=? WHERE contract_id=?", ("Pending Approval", contract_id))
-    conn.commit()
-
-    # Create approvals for each of the 3 designated approvers
-    # For simplicity, let's just find all users with role='approver'
-    c.execute("SELECT user_id FROM users WHERE role='approver'")
-    approvers = c.fetchall()
-    for (approver_id,) in approvers:
-        approval_id = str(uuid.uuid4())
-        c.execute("""
-            INSERT INTO approvals (approval_id, contract_id, approver_id, approval_status, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (approval_id, contract_id, approver_id, "Pending", str(datetime.datetime.now())))
-    conn.commit()
-    conn.close()
+    """Move a Draft contract to Pending Approval; returns False if it was no longer a Draft."""
+    # Status change and all approval rows commit together in one transaction
+    with write_transaction() as conn:
+        c = conn.cursor()
+        # Update status to Pending Approval
+        c.execute(STMTS["update_contract_status"], ("Pending Approval", contract_id, "Draft"))
+        if c.rowcount == 0:
+            return False
+
+        # Create approvals for each of the 3 designated approvers
+        # For simplicity, let's just find all users with role='approver'
+        c.execute(STMTS["select_approvers"])
+        now = str(datetime.datetime.now())
+        rows = [(new_id(), contract_id, row["user_id"], "Pending", now) for row in c.fetchall()]
+        c.executemany(STMTS["insert_approval"], rows)
+    bump_version("contracts", "approvals")
+    return True
 
 # -------------------------
 # 4. APPROVALS (Approvers)
 # -------------------------
+@st.cache_data(ttl=30)
+def load_pending_approvals(approver_id, contracts_version, approvals_version):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT c.contract_id, c.vendor_name, c.description, c.budget, a.approval_id
+            FROM contracts c
+            JOIN approvals a ON c.contract_id = a.contract_id
+            WHERE a.approver_id=? AND a.approval_status='Pending'
+        """, (approver_id,))
+        return [dict(row) for row in c.fetchall()]
+
 def review_contracts():
     st.title("Review Contracts (Approver)")
 
     # Show only contracts that are "Pending Approval" and specifically "Pending" for this approver
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-
     # Current user
     approver_id = st.session_state.user_id
 
-    c.execute("""
-        SELECT c.contract_id, c.vendor_name, c.description, c.budget, a.approval_id, a.approval_status
-        FROM contracts c
-        JOIN approvals a ON c.contract_id = a.contract_id
-        WHERE a.approver_id=? AND a.approval_status='Pending'
-    """, (approver_id,))
-    rows = c.fetchall()
-    conn.close()
+    rows = load_pending_approvals(approver_id, data_version("contracts"), data_version("approvals"))
 
     if rows:
         for row in rows:
-            contract_id, vendor_name, description, budget, approval_id, approval_status = row
-            st.write(f"**Contract ID**: {contract_id}")
-            st.write(f"**Vendor**: {vendor_name}")
-            st.write(f"**Budget**: {budget}")
-            st.write(f"**Description**: {description}")
+            contract_id, approval_id = row["contract_id"], row["approval_id"]
+            st.write(f"**Contract ID**: {format_id(contract_id)}")
+            st.write(f"**Vendor**: {row['vendor_name']}")
+            st.write(f"**Budget**: {format_money(row['budget'])}")
+            st.write(f"**Description**: {row['description']}")
             col1, col2 = st.columns(2)
-            if col1.button(f"Approve {contract_id}", key=f"approve_{contract_id}"):
-                approve_contract(approval_id, contract_id)
-                st.rerun()
-            if col2.button(f"Reject {contract_id}", key=f"reject_{contract_id}"):
-                reject_contract(approval_id, contract_id)
-                st.rerun()
+            if col1.button(f"Approve {format_id(contract_id)}", key=f"approve_{contract_id.hex()}"):
+                if approve_contract(approval_id, contract_id):
+                    st.rerun()
+                st.info("You have already reviewed this contract.")
+            if col2.button(f"Reject {format_id(contract_id)}", key=f"reject_{contract_id.hex()}"):
+                if reject_contract(approval_id, contract_id):
+                    st.rerun()
+                st.info("You have already reviewed this contract.")
             st.write("---")
     else:
         st.info("No contracts pending your approval.")
 
 def approve_contract(approval_id, contract_id):
-    # Approve the individual's record
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    c.execute("UPDATE approvals SET approval_status=? WHERE approval_id=?", ("Approved", approval_id))
-    conn.commit()
-
-    # Check if ALL approvers have approved
-    c.execute("""
-        SELECT COUNT(*) 
-        FROM approvals
-        WHERE contract_id=? AND approval_status='Approved'
-    """, (contract_id,))
-    approved_count = c.fetchone()[0]
-
-    # How many total approvers?
-    c.execute("""
-        SELECT COUNT(*) 
-        FROM approvals
-        WHERE contract_id=?
-    """, (contract_id,))
-    total_approvers = c.fetchone()[0]
-
-    if approved_count == total_approvers:
-        # Everyone approved, set contract to Active
-        c.execute("UPDATE contracts SET status='Active' WHERE contract_id=?", (contract_id,))
-    conn.commit()
-    conn.close()
+    """Record an approval; returns False if it was no longer pending."""
+    with write_transaction() as conn:
+        c = conn.cursor()
+        # Approve the individual's record
+        c.execute(STMTS["update_approval_status"], ("Approved", approval_id))
+        if c.rowcount == 0:
+            return False
+        # If ALL approvers have approved, set contract to Active
+        c.execute(STMTS["activate_if_fully_approved"], (contract_id, contract_id))
+    bump_version("contracts", "approvals")
+    return True
 
 def reject_contract(approval_id, contract_id):
-    # Reject the individual's record
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    c.execute("UPDATE approvals SET approval_status=? WHERE approval_id=?", ("Rejected", approval_id))
-    # Also set the contract status to Rejected
-    c.execute("UPDATE contracts SET status='Rejected' WHERE contract_id=?", (contract_id,))
-    conn.commit()
-    conn.close()
+    """Record a rejection; returns False if the approval was no longer pending."""
+    with write_transaction() as conn:
+        c = conn.cursor()
+        # Reject the individual's record
+        c.execute(STMTS["update_approval_status"], ("Rejected", approval_id))
+        if c.rowcount == 0:
+            return False
+        # Also set the contract status to Rejected
+        c.execute(STMTS["update_contract_status"], ("Rejected", contract_id, "Pending Approval"))
+    bump_version("contracts", "approvals")
+    return True
 
 # ---------------------------
 # 5. SERVICE REPORTS (All)
 # ---------------------------
+@st.cache_data(ttl=30)
+def load_service_reports(version, page):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT report_id, contract_id, service_date, work_performed, parts_cost, labor_hours
+            FROM service_reports
+            ORDER BY rowid LIMIT ? OFFSET ?
+        """, (PAGE_SIZE, (page - 1) * PAGE_SIZE))
+        return [dict(row) for row in c.fetchall()]
+
 def manage_service_reports():
     st.title("Service Reports")
 
     # Show a list of existing service reports
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    c.execute("""
-        SELECT report_id, contract_id, service_date, work_performed, parts_cost, labor_hours
-        FROM service_reports
-    """)
-    rows = c.fetchall()
-    conn.close()
+    version = data_version("service_reports")
+    total = count_rows("service_reports", version)
 
     st.subheader("Existing Service Reports")
-    if rows:
-        for r in rows:
-            report_id, contract_id, service_date, work_performed, parts_cost, labor_hours = r
-            st.write(f"**Report ID**: {report_id}")
-            st.write(f"**Contract ID**: {contract_id}")
-            st.write(f"**Date**: {service_date}")
-            st.write(f"**Work Performed**: {work_performed}")
-            st.write(f"**Parts Cost**: {parts_cost}, **Labor Hours**: {labor_hours}")
-            st.write("---")
+    if total:
+        page = page_number(total, "service_reports_page")
+        rows = load_service_reports(version, page)
+        st.dataframe(pd.DataFrame(
+            [(format_id(row["report_id"]), format_id(row["contract_id"]), row["service_date"],
+              row["work_performed"], format_money(row["parts_cost"]), row["labor_hours"]) for row in rows],
+            columns=["Report ID", "Contract ID", "Date", "Work Performed", "Parts Cost", "Labor Hours"],
+        ), hide_index=True)
     else:
         st.info("No service reports found.")
 
     st.subheader("Submit New Service Report")
     with st.form("new_report_form", clear_on_submit=True):
-        contract_id = st.text_input("Contract ID")
+        contract_text = st.text_input("Contract ID")
         service_date = st.date_input("Service Date", datetime.date.today())
         work_performed = st.text_area("Work Performed")
         parts_cost = st.number_input("Parts Cost", min_value=0.0, step=1.0)
@@ -393,70 +812,77 @@ def manage_service_reports():
         submitted = st.form_submit_button("Submit Report")
 
         if submitted:
-            report_id = str(uuid.uuid4())
-            conn = sqlite3.connect("contracts.db")
-            c = conn.cursor()
-            c.execute("""
-                INSERT INTO service_reports (report_id, contract_id, service_date, work_performed, parts_cost, labor_hours)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (report_id, contract_id, str(service_date), work_performed, parts_cost, labor_hours))
-            conn.commit()
-            conn.close()
-            st.success("Service report submitted.")
-            st.rerun()
+            contract_id = resolve_contract_id(contract_text)
+            if contract_id is not None:
+                report_id = new_id()
+                with get_conn(write=True) as conn:
+                    c = conn.cursor()
+                    c.execute(STMTS["insert_service_report"], (report_id, contract_id, str(service_date), work_performed, to_cents(parts_cost), labor_hours))
+                bump_version("service_reports")
+                st.success("Service report submitted.")
+                st.rerun()
 
 # ------------------------
 # 6. INVOICES (Finance)
 # ------------------------
+@st.cache_data(ttl=30)
+def load_invoices(version, page):
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT invoice_id, contract_id, amount, invoice_date, payment_status
+            FROM invoices
+            ORDER BY rowid LIMIT ? OFFSET ?
+        """, (PAGE_SIZE, (page - 1) * PAGE_SIZE))
+        return [dict(row) for row in c.fetchall()]
+
 def manage_invoices():
     st.title("Invoices (Finance Role)")
 
     # Show existing invoices
-    conn = sqlite3.connect("contracts.db")
-    c = conn.cursor()
-    c.execute("""
-        SELECT invoice_id, contract_id, amount, invoice_date, payment_status
-        FROM invoices
-    """)
-    rows = c.fetchall()
+    version = data_version("invoices")
+    total = count_rows("invoices", version)
 
     st.subheader("Existing Invoices")
-    if rows:
-        for inv in rows:
-            invoice_id, contract_id, amount, invoice_date, payment_status = inv
-            st.write(f"**Invoice ID**: {invoice_id}")
-            st.write(f"**Contract ID**: {contract_id}")
-            st.write(f"**Amount**: {amount}")
-            st.write(f"**Date**: {invoice_date}")
-            st.write(f"**Status**: {payment_status}")
-
-            # Mark as Paid
-            if payment_status != "Paid":
-                if st.button(f"Mark Paid - {invoice_id}"):
-                    c.execute("UPDATE invoices SET payment_status='Paid' WHERE invoice_id=?", (invoice_id,))
-                    conn.commit()
+    if total:
+        page = page_number(total, "invoices_page")
+        rows = load_invoices(version, page)
+        st.dataframe(pd.DataFrame(
+            [(format_id(row["invoice_id"]), format_id(row["contract_id"]), format_money(row["amount"]),
+              row["invoice_date"], row["payment_status"]) for row in rows],
+            columns=["Invoice ID", "Contract ID", "Amount", "Date", "Status"],
+        ), hide_index=True)
+
+        # Mark as Paid
+        unpaid = {row["invoice_id"]: f"{format_id(row['invoice_id'])} - {format_money(row['amount'])}"
+                  for row in rows if row["payment_status"] != "Paid"}
+        if unpaid:
+            invoice_id = st.selectbox("Unpaid invoice", list(unpaid), format_func=unpaid.get)
+            if st.button("Mark Paid"):
+                with get_conn(write=True) as conn:
+                    changed = conn.execute(STMTS["mark_invoice_paid"], (invoice_id,)).rowcount
+                if changed:
+                    bump_version("invoices")
                     st.rerun()
-            st.write("---")
+                st.info("This invoice is already paid.")
     else:
         st.info("No invoices found.")
 
     st.subheader("Generate New Invoice")
     with st.form("new_invoice_form", clear_on_submit=True):
-        contract_id = st.text_input("Contract ID")
+        contract_text = st.text_input("Contract ID")
         amount = st.number_input("Amount", min_value=0.0, step=1.0)
         submitted = st.form_submit_button("Generate Invoice")
         if submitted:
-            invoice_id = str(uuid.uuid4())
-            invoice_date = str(datetime.date.today())
-            c.execute("""
-                INSERT INTO invoices (invoice_id, contract_id, amount, invoice_date, payment_status)
-                VALUES (?, ?, ?, ?, ?)
-            """, (invoice_id, contract_id, amount, invoice_date, "Pending"))
-            conn.commit()
-            st.success(f"Invoice {invoice_id} generated!")
-            st.rerun()
-
-    conn.close()
+            contract_id = resolve_contract_id(contract_text)
+            if contract_id is not None:
+                invoice_id = new_id()
+                invoice_date = str(datetime.date.today())
+                with get_conn(write=True) as conn:
+                    conn.execute(STMTS["insert_invoice"], (invoice_id, contract_id, to_cents(amount), invoice_date, "Pending"))
+                bump_version("invoices")
+                st.success(f"Invoice {format_id(invoice_id)} generated!")
+                st.rerun()
 
 # -------------
 # RUN THE APP